@@ -1,26 +1,44 @@
 import os
+import socket
 import sys
+import time
 import requests
 import dotenv
 import deezer
 import json
 import unicodedata
+from pathlib import Path
 from typing import Tuple
 from http.server import BaseHTTPRequestHandler, HTTPServer
 
-# Load environment variables from the .env file
-dotenv.load_dotenv()
+# Parse the .env once at import; helpers read the cached dict and only
+# touch the disk again through set_key.
+_DOTENV_PATH = dotenv.find_dotenv()
+_ENV = dotenv.dotenv_values(_DOTENV_PATH)
+for _key, _value in _ENV.items():
+    if _value is not None:
+        os.environ.setdefault(_key, _value)
 
-# Global variable to store the authorization code
-authorization_code = None
+# Shared session so repeated Deezer calls reuse pooled connections
+SESSION = requests.Session()
+
+class OAuthServer(HTTPServer):
+    # Reusing the address avoids the TIME_WAIT stall on quick re-runs
+    allow_reuse_address = True
+    auth_code = None
+
+    def server_bind(self):
+        # SO_REUSEPORT must be set before the socket binds to take effect
+        if hasattr(socket, "SO_REUSEPORT"):
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        super().server_bind()
 
 
 class OAuthHandler(BaseHTTPRequestHandler):
     def do_GET(self):
-        global authorization_code
         path = self.path
         if "/oauth/return" in path and "code=" in path:
-            authorization_code = path.split("code=")[1]
+            self.server.auth_code = path.split("code=")[1]
             self.send_response(200)
             self.end_headers()
             self.wfile.write(b"Authorization code received. You can close this window.")
@@ -33,11 +51,16 @@ class OAuthHandler(BaseHTTPRequestHandler):
         pass
 
 
-def start_local_server(port=8080) -> str:
+def start_local_server(port=8080, timeout=60) -> str | None:
     server_address = ('', port)
-    httpd = HTTPServer(server_address, OAuthHandler)
-    httpd.handle_request()  # Block until the first request is received
-    return authorization_code
+    with OAuthServer(server_address, OAuthHandler) as httpd:
+        # Serve one request at a time until the redirect delivers the
+        # code or the wait expires, so a stalled browser can't hang us
+        httpd.timeout = timeout
+        deadline = time.monotonic() + timeout
+        while httpd.auth_code is None and time.monotonic() < deadline:
+            httpd.handle_request()
+        return httpd.auth_code
 
 
 def connect_to_deezer(name: str) -> Tuple[str, str]:
@@ -80,11 +103,13 @@ def get_access_token(code: str) -> str:
         print("Error: Missing Deezer credentials in environment variables.")
         sys.exit(1)
 
-    token_url = (
-        f"https://connect.deezer.com/oauth/access_token.php?app_id={DEEZER_APP_ID}"
-        f"&secret={DEEZER_SECRET_TOKEN}&code={code}&output=json"
-    )
-    response = requests.get(token_url)
+    token_url = "https://connect.deezer.com/oauth/access_token.php"
+    response = SESSION.get(token_url, params={
+        "app_id": DEEZER_APP_ID,
+        "secret": DEEZER_SECRET_TOKEN,
+        "code": code,
+        "output": "json",
+    }, timeout=10)
     if response.status_code == 200:
         token_data = response.json()
         access_token = token_data.get("access_token")
@@ -109,71 +134,57 @@ def save_access_token(name: str, token: str, yml_file: str = ".github/workflows/
     :param yml_file: Path to the GitHub Actions workflow yml file
     """
 
-    # Load the .env file
-    dotenv_file = dotenv.find_dotenv()
-    dotenv.load_dotenv(dotenv_file)
-
-    # Update the variable in the .env file
+    # Update the variable in the .env file and the in-memory caches
     ACCESS_TOKEN_name = f"ACCESS_TOKEN_{name}"
     Playlist_ID_name = f"PLAYLIST_ID_{name}"
-    dotenv.set_key(dotenv_file, ACCESS_TOKEN_name, token)
-    dotenv.set_key(dotenv_file, Playlist_ID_name, "")  # Initialize the playlist ID to an empty string
-    dotenv.load_dotenv(dotenv_file)
+    dotenv.set_key(_DOTENV_PATH, ACCESS_TOKEN_name, token)
+    dotenv.set_key(_DOTENV_PATH, Playlist_ID_name, "")  # Initialize the playlist ID to an empty string
+    _ENV[ACCESS_TOKEN_name] = os.environ[ACCESS_TOKEN_name] = token
+    _ENV[Playlist_ID_name] = os.environ[Playlist_ID_name] = ""
     print(f"Environment variable {ACCESS_TOKEN_name} updated in the .env file.")
 
     # Check and update the yml file
-    if not os.path.exists(yml_file):
+    try:
+        text = Path(yml_file).read_text()
+    except FileNotFoundError:
         print(f"Error: The file {yml_file} does not exist.")
         return
 
-    # Read the yml file
-    with open(yml_file, "r") as file:
-        lines = file.readlines()
-
     # Prepare the secret strings to add
     token_secret = f"        ACCESS_TOKEN_{name}: ${{{{ secrets.ACCESS_TOKEN_{name} }}}}\n"
     playlist_secret = f"        PLAYLIST_ID_{name}: ${{{{ secrets.PLAYLIST_ID_{name} }}}}\n"
 
-    # Find the correct 'env' block under 'Run the script to update the playlist'
-    found_env = False
-    new_lines = []
-    for line in lines:
-        new_lines.append(line)
-
-        # Find the 'env:' line in the correct job
-        if "- name: Run the script to update the playlist" in line:
-            found_env = True
-        elif found_env and "env:" in line:
-            # Insert the new secrets after the existing 'env:' section
-            new_lines.append(token_secret)
-            new_lines.append(playlist_secret)
-            found_env = False  # Reset flag after insertion
-
-    # Write the modified content back to the yml file
-    with open(yml_file, "w") as file:
-        file.write("".join(new_lines))
+    # Insert right after the 'env:' line of the update step, anchored on
+    # the step name so other env: blocks in the file are left alone
+    try:
+        anchor = text.index("- name: Run the script to update the playlist")
+        env_pos = text.index("env:\n", anchor) + len("env:\n")
+    except ValueError:
+        print(f"Error: Could not find the env block in {yml_file}.")
+        return
+
+    text = text[:env_pos] + token_secret + playlist_secret + text[env_pos:]
+    Path(yml_file).write_text(text)
 
     print(f"Secrets for {name} added to the file {yml_file}.")
 
 
 
 def update_names_in_env(new_name: str) -> None:
-    dotenv_file = dotenv.find_dotenv()
-    dotenv.load_dotenv(dotenv_file)
-
-    names_str = os.getenv("NAMES", '[]')
+    names_str = _ENV.get("NAMES") or os.getenv("NAMES", '[]')
     names_list = json.loads(names_str)
 
     if new_name not in names_list:
         names_list.append(new_name)
 
     updated_names_str = json.dumps(names_list)
-    dotenv.set_key(dotenv_file, "NAMES", updated_names_str)
+    dotenv.set_key(_DOTENV_PATH, "NAMES", updated_names_str)
+    _ENV["NAMES"] = os.environ["NAMES"] = updated_names_str
 
 
 def remove_accents(input_str: str) -> str:
     nfkd_form = unicodedata.normalize('NFKD', input_str)
-    return "".join([c for c in nfkd_form if not unicodedata.combining(c)])
+    return nfkd_form.encode('ascii', 'ignore').decode('ascii')
 
 
 def main():
@@ -191,6 +202,9 @@ def main():
         print(f"Please go to the following URL to authorize the application:\n{oauth_url}")
 
         authorization_code = start_local_server()
+        if not authorization_code:
+            print("Error: No authorization code received before the timeout.")
+            sys.exit(1)
 
         access_token = get_access_token(authorization_code)
 
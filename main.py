@@ -1,7 +1,11 @@
+import json
 import os
 import sys
+import threading
 import time
-from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, datetime, timedelta
+from itertools import islice
 from typing import Any, Union, List, Tuple
 import deezer
 import deezer.client
@@ -9,25 +13,79 @@ import deezer.pagination
 import deezer.resources
 import dotenv
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from tqdm import tqdm
 
-
-class RateLimiter:
-    def __init__(self, max_requests: int, period: int) -> None:
-        self.max_requests = max_requests
-        self.period = period
-        self.requests = []
-
-    def wait(self) -> None:
-        while len(self.requests) >= self.max_requests:
-            if time.time() - self.requests[0] > self.period:
-                self.requests.pop(0)
-            else:
-                time.sleep(self.period - (time.time() - self.requests[0]))
+try:
+    # orjson parses Deezer's small payloads several times faster than the
+    # stdlib and works straight on the response bytes
+    import orjson
+    _loads = orjson.loads
+except ImportError:
+    _loads = json.loads
+
+# Shared session so every call to api.deezer.com reuses the same pooled
+# TCP+TLS connections instead of paying a new handshake per request.
+# Retries back off exponentially and honor Deezer's Retry-After header,
+# so transient 429/5xx responses sleep only as long as required.
+SESSION = requests.Session()
+SESSION.mount("https://", HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=32,
+    max_retries=Retry(
+        total=5,
+        backoff_factor=0.5,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=frozenset(["GET", "POST", "DELETE"]),
+        respect_retry_after_header=True,
+    )))
+SESSION.headers.update({"Accept-Encoding": "gzip"})
+
+# Locate the .env once; every writer below reuses the cached path
+_DOTENV_PATH = dotenv.find_dotenv()
+
+# Deezer caps the number of track ids accepted per add/delete request
+MAX_TRACKS_PER_REQUEST = 100
+
+
+def _chunks(seq, size: int):
+    it = iter(seq)
+    return iter(lambda: list(islice(it, size)), [])
+
+
+class TokenBucket:
+    """Token-bucket limiter matching Deezer's burst + sustained rate policy.
+
+    Allows bursts up to `capacity` requests, then paces at `refill_per_sec`.
+    A request taken while the bucket is in debt sleeps just long enough for
+    the refill to cover it, instead of idling a full window like a hard
+    sliding-window limiter would.
+    """
+
+    def __init__(self, capacity: int, refill_per_sec: float) -> None:
+        self.capacity = capacity
+        self.refill_per_sec = refill_per_sec
+        self.tokens = float(capacity)
+        self.last_refill = time.monotonic()
+        self._lock = threading.Lock()
 
     def add_request(self) -> None:
-        self.wait()
-        self.requests.append(time.time())
+        with self._lock:
+            # monotonic() is immune to wall-clock jumps (NTP, DST)
+            now = time.monotonic()
+            self.tokens = min(float(self.capacity),
+                              self.tokens + (now - self.last_refill) * self.refill_per_sec)
+            self.last_refill = now
+            self.tokens -= 1
+            sleep_for = -self.tokens / self.refill_per_sec if self.tokens < 0 else 0.0
+        if sleep_for > 0:
+            time.sleep(sleep_for)
+
+    def penalize(self) -> None:
+        """Push the bucket into debt after a 429 so retries wait out a refill."""
+        with self._lock:
+            self.tokens = min(-1.0, self.tokens - self.refill_per_sec)
 
 
 def connect_to_deezer(access_token: str | None) -> Tuple[deezer.Client, deezer.User]:
@@ -47,6 +105,52 @@ def connect_to_deezer(access_token: str | None) -> Tuple[deezer.Client, deezer.U
     return client, user
 
 
+def _fetch_artist_new_tracks(artist: deezer.Artist, today, yesterday, window_start) -> List[int]:
+    new_tracks = []
+    # Hit REST directly with a fields= projection: the scan only needs id
+    # and release_date, a fraction of the full album resources the client
+    # library would fetch and parse per page.
+    url = (f"https://api.deezer.com/artist/{artist.id}/albums"
+           f"?limit=50&fields=id,release_date&order=RELEASE_DATE_DESC")
+    while url:
+        payload = _fetch_page(url)
+        if payload is None:
+            break
+
+        for album in payload.get('data', []):
+            raw_date = album.get('release_date')
+            if not raw_date:
+                continue
+            try:
+                release_date = date.fromisoformat(raw_date)
+            except ValueError:
+                # Deezer returns the placeholder "0000-00-00" for some
+                # albums; skip them like the client library's parse_date
+                continue
+            if release_date < yesterday:
+                # Albums arrive newest first, so nothing further (on this
+                # page or the next ones) can still match the window
+                return new_tracks
+            if release_date in (today, yesterday):
+                if not (window_start <= release_date <= today):
+                    continue
+                # The album resource carries its full tracklist inline, so
+                # one round-trip replaces the extra get_tracks call per
+                # album (and the lazy per-track release_date fetches).
+                limiter.add_request()
+                response = SESSION.get(
+                    f"https://api.deezer.com/album/{album['id']}", timeout=10)
+                if response.status_code != 200:
+                    continue
+                album_payload: dict = _loads(response.content)
+                new_tracks.extend(
+                    track['id'] for track in album_payload.get('tracks', {}).get('data', []))
+
+        url = payload.get('next')
+
+    return new_tracks
+
+
 def get_new_releases_from_followed_artists(user: deezer.User, days: int) -> List[int]:
     print("Fetching new releases from followed artists...")
     followed_artists: deezer.pagination.PaginatedList | deezer.Artist | None = safe_deezer_request(
@@ -55,32 +159,20 @@ def get_new_releases_from_followed_artists(user: deezer.User, days: int) -> List
         return []
 
     new_tracks = []
-    total_artists = len(followed_artists)
     today = datetime.today().date()
-    progress_step = max(1, total_artists // 100)
-    with tqdm(total=100, desc="Progress") as pbar:
-        for index, artist in enumerate(followed_artists):
-            # on détermine le type de variable que contient la variable artist.
-
-            albums: deezer.pagination.PaginatedList | deezer.Album | None = safe_deezer_request(
-                artist, "get_albums")
-            if albums is None or albums == deezer.Album:
-                continue
-
-            for album in albums:
-                release_date = album.release_date
-                if release_date == today or release_date == (today - timedelta(days=1)):
-                    tracks: deezer.pagination.PaginatedList | deezer.Track | None = safe_deezer_request(
-                        album, "get_tracks")
-                    if tracks is None or tracks == deezer.Track:
-                        continue
-
-                    for track in tracks:
-                        track_released = track.release_date
-                        if today - timedelta(days=days) <= track_released <= today:
-                            new_tracks.append(track.id)
-
-            if (index + 1) % progress_step == 0:
+    yesterday = today - timedelta(days=1)
+    window_start = today - timedelta(days=days)
+    # The work is all waiting on api.deezer.com, so fan out per artist;
+    # the rate limiter keeps the in-flight budget within Deezer's limits.
+    max_workers = min(8, limiter.capacity)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(_fetch_artist_new_tracks, artist,
+                                   today, yesterday, window_start)
+                   for artist in followed_artists]
+        # mininterval bounds redraw cost no matter how many artists finish
+        with tqdm(total=len(futures), desc="Progress", mininterval=0.5) as pbar:
+            for future in as_completed(futures):
+                new_tracks.extend(future.result())
                 pbar.update(1)
 
     return new_tracks
@@ -88,28 +180,30 @@ def get_new_releases_from_followed_artists(user: deezer.User, days: int) -> List
 
 def get_tracks_listened_last_hours(access_token: str, user: deezer.User, days: int = 2) -> List[int]:
     user_id = user.id
-    url = f"https://api.deezer.com/user/{user_id}/history?access_token={access_token}"
+    url = f"https://api.deezer.com/user/{user_id}/history"
+    params = {"access_token": access_token}
 
     listened_tracks = []
-    time_limit = datetime.now() - timedelta(days=days)
+    # Compare raw UNIX timestamps: building a datetime per history entry
+    # is pure overhead in this loop
+    cutoff_ts = time.time() - days * 86400
 
     while url:
         limiter.add_request()
-        response = requests.get(url)
+        response = SESSION.get(url, params=params, timeout=10)
+        params = None  # the 'next' URL already carries the token
         if response.status_code != 200:
             print(f"History retrieval failed: {response.status_code}")
             break
 
-        history_data: list[dict] = response.json().get('data', [])
-        for entry in history_data:
-            track_timestamp = datetime.fromtimestamp(entry['timestamp'])
-            if track_timestamp >= time_limit:
+        payload: dict = _loads(response.content)
+        for entry in payload.get('data', []):
+            if entry['timestamp'] >= cutoff_ts:
                 listened_tracks.append(entry['id'])
-                listened_tracks: list[int]
             else:
                 return listened_tracks
 
-        url = str(response.json().get('next'))
+        url = payload.get('next')
 
     return listened_tracks
 
@@ -121,9 +215,7 @@ def find_or_create_playlist(playlist_name: str, user: deezer.User) -> str:
     if not playlists:
         print(f"Playlist not found for user. Creation of a new playlist.")
         return create_playlist(playlist_name)
-    playlists: deezer.Playlist | deezer.pagination.PaginatedList
     for playlist in playlists:
-        playlist: deezer.Playlist
         if playlist.title.lower() == playlist_name.lower() and playlist.creator.id == user.id:
             return str(playlist.id)
 
@@ -139,21 +231,43 @@ def create_playlist(playlist_name: str) -> str:
         sys.exit(1)
 
 
-def get_all_tracks_from_playlist(playlist_id: str) -> list[int]:
-    all_tracks = []
-    url = f"https://api.deezer.com/playlist/{playlist_id}/tracks"
-    while url:
-        limiter.add_request()
-        response = requests.get(url)
-        if response.status_code != 200:
-            print(f"Error when retrieving titles : {response.status_code}")
-            break
+def _fetch_page(url: str) -> dict | None:
+    limiter.add_request()
+    response = SESSION.get(url, timeout=10)
+    if response.status_code != 200:
+        print(f"Error when retrieving page : {response.status_code}")
+        return None
+    return _loads(response.content)
+
 
-        data: dict = response.json()
-        for track in data['data']:
-            all_tracks.append(track['id'])
-        url: str = data.get('next')
-    all_tracks: list[int]
+def get_all_tracks_from_playlist(playlist_id: str) -> list[int]:
+    base_url = f"https://api.deezer.com/playlist/{playlist_id}/tracks"
+    data = _fetch_page(base_url)
+    if data is None:
+        return []
+    all_tracks = [track['id'] for track in data['data']]
+
+    total = data.get('total')
+    page_size = len(data['data'])
+    if total and page_size:
+        # Consecutive pages differ only by index=, so fetch the remaining
+        # ones in parallel instead of chaining one RTT per 'next' URL.
+        urls = [f"{base_url}?index={index}"
+                for index in range(page_size, total, page_size)]
+        max_workers = min(8, limiter.capacity)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for page in executor.map(_fetch_page, urls):
+                if page is not None:
+                    all_tracks.extend(track['id'] for track in page['data'])
+    else:
+        # No total reported: fall back to following 'next' sequentially
+        url = data.get('next')
+        while url:
+            data = _fetch_page(url)
+            if data is None:
+                break
+            all_tracks.extend(track['id'] for track in data['data'])
+            url = data.get('next')
     return all_tracks
 
 
@@ -161,12 +275,11 @@ def update_daily_playlist(client: deezer.Client, access_token: str, user: deezer
     try:
         if not playlist_id:
             raise ValueError("You did not provide a playlist ID at all.")
-        playlist_id: str
         limiter.add_request()
-        response = requests.get(
-            f"https://api.deezer.com/playlist/{playlist_id}")
+        response = SESSION.get(
+            f"https://api.deezer.com/playlist/{playlist_id}", timeout=10)
         response.raise_for_status()
-        playlist_data = response.json()
+        playlist_data = _loads(response.content)
 
         if 'error' in playlist_data and playlist_data['error']['code'] == 800:
             print("Invalid Playlist ID. Deleted?")
@@ -174,29 +287,31 @@ def update_daily_playlist(client: deezer.Client, access_token: str, user: deezer
     except (requests.exceptions.HTTPError, ValueError):
         print("Creating a new one.")
         playlist_id = find_or_create_playlist(playlist_name, user)
-        dotenv.set_key(dotenv.find_dotenv(), f"PLAYLIST_ID_{name}",
-                       playlist_id)
-        dotenv.load_dotenv()
+        dotenv.set_key(_DOTENV_PATH, f"PLAYLIST_ID_{name}", playlist_id)
+        os.environ[f"PLAYLIST_ID_{name}"] = playlist_id
 
     new_tracks = get_new_releases_from_followed_artists(user, days)
-    listened_tracks = get_tracks_listened_last_hours(access_token, user, days)
-    playlist_tracks_ids = get_all_tracks_from_playlist(playlist_id)
-    new_tracks_ids = list(
-        set(new_tracks) - set(playlist_tracks_ids) - set(listened_tracks))
-    listened_tracks_in_playlist = list(
-        set(listened_tracks) & set(playlist_tracks_ids))
+    listened_ids = frozenset(
+        get_tracks_listened_last_hours(access_token, user, days))
+    playlist_ids = frozenset(get_all_tracks_from_playlist(playlist_id))
+    new_tracks_ids = list(frozenset(new_tracks) - playlist_ids - listened_ids)
+    listened_tracks_in_playlist = list(listened_ids & playlist_ids)
 
-    if new_tracks_ids:
+    # One fetch of the playlist resource serves both write branches
+    playlist_obj = None
+    if new_tracks_ids or listened_tracks_in_playlist:
+        playlist_obj = safe_deezer_request(client, "get_playlist", playlist_id)
 
-        safe_deezer_request(safe_deezer_request(
-            client, "get_playlist", playlist_id), "add_tracks", new_tracks_ids)
+    if new_tracks_ids:
+        for chunk in _chunks(new_tracks_ids, MAX_TRACKS_PER_REQUEST):
+            safe_deezer_request(playlist_obj, "add_tracks", chunk)
         print(f"Added {len(new_tracks_ids)} new tracks to the playlist.")
     else:
         print("No new titles to add to the playlist.")
 
     if listened_tracks_in_playlist:
-        safe_deezer_request(safe_deezer_request(
-            client, "get_playlist", playlist_id), "delete_tracks", listened_tracks_in_playlist)
+        for chunk in _chunks(listened_tracks_in_playlist, MAX_TRACKS_PER_REQUEST):
+            safe_deezer_request(playlist_obj, "delete_tracks", chunk)
         print(
             f"Removed {len(listened_tracks_in_playlist)} listened tracks from the playlist.")
     else:
@@ -210,19 +325,22 @@ def safe_deezer_request(
     **kwargs,
 ) -> Union[bool, deezer.pagination.PaginatedList, deezer.Playlist, deezer.User, deezer.Artist, deezer.Album, deezer.Track, None]:
     max_retries = 5
+    bound_method = getattr(obj, method)
     for attempt in range(max_retries):
         if attempt > 0:
             print(f"Attempt {attempt + 1}/{max_retries}")
         try:
             limiter.add_request()
-            return getattr(obj, method)(*args, **kwargs)
+            return bound_method(*args, **kwargs)
         except deezer.exceptions.DeezerForbiddenError:
             print(f"Error: Forbidden. Please check your Rate Limit.")
-            time.sleep(5)
+            limiter.penalize()
             continue
         except deezer.exceptions.DeezerRetryableHTTPError:
+            # The deezer client has its own HTTP stack, so the Session's
+            # Retry does not cover it: back off exponentially here instead
             print("Temporary issue, retrying...")
-            time.sleep(5)
+            time.sleep(0.5 * 2 ** attempt)
         except deezer.exceptions.DeezerNotFoundError:
             print("Resource not found.")
             return None
@@ -249,7 +367,6 @@ def safe_deezer_request(
 def main(access_token: str | None, playlist_id: str | None) -> None:
 
     client, user = connect_to_deezer(access_token)
-    access_token: str = access_token
     print("Updating playlist...")
     update_daily_playlist(client, access_token, user,
                           "Deezer News 🎶", playlist_id, days=2)
@@ -257,16 +374,16 @@ def main(access_token: str | None, playlist_id: str | None) -> None:
 
 if __name__ == "__main__":
     try:
-        # 45 requests every 5 seconds, 50 max requests per 5 seconds
-        limiter = RateLimiter(max_requests=50, period=5)
-        dotenv.load_dotenv()
+        # 45 requests every 5 seconds sustained, 50 max requests in a burst
+        limiter = TokenBucket(capacity=50, refill_per_sec=45 / 5)
+        dotenv.load_dotenv(_DOTENV_PATH)
         names: str | None = os.getenv("NAMES")
         if not names:
             print(
                 "Error: No NAMES found. Please provide a list of names separated by commas.")
             sys.exit(1)
-        names = names[1:-1].split(", ")  # split the string into a list
-        names = [name[1:-1] for name in names]  # remove the quotes
+        # NAMES is written by update_names_in_env as a JSON list
+        names = json.loads(names)
         for name in names:
             access_token: str | None = os.getenv(f"ACCESS_TOKEN_{name}")
             playlist_id: str | None = os.getenv(f"PLAYLIST_ID_{name}")
@@ -274,3 +391,5 @@ if __name__ == "__main__":
         print("Finished !")
     except KeyboardInterrupt:
         print("Interrupted by user.")
+    finally:
+        SESSION.close()